@@ -0,0 +1,355 @@
+import os
+import queue
+import socket
+import sys
+import threading
+from collections import deque
+
+# The transport layer lives in a sibling directory, so make its modules
+# importable the same way they import each other (by plain module name)
+TRANSPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Transport Layer (4)')
+if TRANSPORT_DIR not in sys.path:
+    sys.path.insert(0, TRANSPORT_DIR)
+
+from segment import Segment, SegmentType
+from transport import ServerConnection, TransportClient, TransportServer
+
+
+class Connection:
+    """
+    A single established connection between client and server.
+
+    Backends hand out Connection objects so the application layer can send
+    and receive encoded Messages without caring what carries them.
+    recv() returns b'' once the peer has closed the connection, just like
+    a TCP socket does.
+    """
+    def send(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def recv(self) -> bytes:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class Listener:
+    """Server-side endpoint that accepts new Connections"""
+    # Whether accepted connections can be served at the same time
+    concurrent = False
+
+    def accept(self):
+        """Block until a client connects. Returns (Connection, address)"""
+        raise NotImplementedError
+
+    def getsockname(self):
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class TransportBackend:
+    """
+    Base class for the transport used underneath the application protocol.
+
+    A backend knows how to open a Connection to a server (client side) and
+    how to create a Listener bound to an address (server side).
+    """
+    name = None
+
+    def connect(self, host, port) -> Connection:
+        raise NotImplementedError
+
+    def listen(self, host, port) -> Listener:
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------
+# TCP backend - the operating system's TCP stack
+# ---------------------------------------------------------------------------
+
+class TCPConnection(Connection):
+    """
+    Connection over a TCP stream socket.
+
+    TCP is a byte stream, so message boundaries are not preserved. Each
+    encoded Message is terminated with a newline (JSON encoding never
+    produces a raw newline) and recv() reads until it has a full message.
+    """
+    def __init__(self, sock):
+        self.socket = sock
+        self.buffer = b''
+
+    def send(self, data: bytes) -> None:
+        self.socket.sendall(data + b'\n')
+
+    def recv(self) -> bytes:
+        while b'\n' not in self.buffer:
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                return b''
+            self.buffer += chunk
+        data, self.buffer = self.buffer.split(b'\n', 1)
+        return data
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+class TCPListener(Listener):
+    # Every accepted connection has its own socket
+    concurrent = True
+
+    def __init__(self, host, port):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.socket.listen()
+
+    def accept(self):
+        client_socket, address = self.socket.accept()
+        # Messages are small and request/response, don't let Nagle delay them
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return TCPConnection(client_socket), address
+
+    def getsockname(self):
+        return self.socket.getsockname()
+
+    def close(self) -> None:
+        # close() alone doesn't wake a thread blocked in accept(), shutdown() does
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+class TCPBackend(TransportBackend):
+    """Run the application protocol over the OS TCP stack (SOCK_STREAM)"""
+    name = 'tcp'
+
+    def connect(self, host, port) -> Connection:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect((host, port))
+        return TCPConnection(sock)
+
+    def listen(self, host, port) -> Listener:
+        return TCPListener(host, port)
+
+
+# ---------------------------------------------------------------------------
+# UDP backend - our own reliable transport from the Transport Layer (4)
+# ---------------------------------------------------------------------------
+
+class UDPClientConnection(Connection):
+    """
+    Client side of a connection over the custom reliable transport.
+    
+    Encoded Messages are carried as the payload of DATA segments. Our
+    transport reassembles messages split across several segments and
+    delivers them whole, so no extra framing is needed.
+    Everything is sent on stream 0.
+    """
+    def __init__(self, transport: TransportClient):
+        self.transport = transport
+        self.peer_closed = False
+        # Payloads delivered by the transport but not yet returned by recv()
+        self.ready = deque()
+
+    def send(self, data: bytes) -> None:
+        # The server may already be sending us data (e.g. its response, if
+        # our ACK got lost) - keep it for recv() instead of dropping it
+        if not self.transport.send_message({'data': data.decode('utf-8')}, on_segment=self.handle_segment):
+            raise ConnectionError("Segment was not acknowledged by server")
+
+    def recv(self) -> bytes:
+        while not self.ready and not self.peer_closed:
+            segment, addr = self.transport.receive_segment()
+            if segment:
+                self.handle_segment(segment, addr)
+        return self.ready.popleft() if self.ready else b''
+
+    def handle_segment(self, segment: Segment, addr) -> None:
+        """Process a segment from the server, queueing any delivered data"""
+        # The client socket only ever talks to its server
+        if segment.flags == SegmentType.FIN:
+            self.transport.acknowledge_fin(segment, addr)
+            self.peer_closed = True
+        elif segment.flags == SegmentType.DATA:
+            for _, payload in self.transport.handle_received_data(segment, addr):
+                self.ready.append(payload['data'].encode('utf-8'))
+
+    def close(self) -> None:
+        # Tell the server we are done so its recv() returns b''
+        if not self.peer_closed and self.transport.connected:
+            self.transport.send_fin(self.transport.server_addr, on_segment=self.handle_segment)
+        self.transport.close()
+
+
+class UDPServerConnection(Connection):
+    """
+    Server side of a connection over the custom reliable transport.
+    
+    All clients share the listener's socket, but each connection has its
+    own ServerConnection transport state. The listener's receive thread
+    hands it this client's segments, so clients can be served concurrently.
+    """
+    def __init__(self, listener: 'UDPListener', transport: ServerConnection):
+        self.listener = listener
+        self.transport = transport
+        self.addr = transport.addr
+        self.peer_closed = False
+        self.ready = deque()
+
+    def send(self, data: bytes) -> None:
+        # Segments arriving while we wait for ACKs (e.g. the client
+        # retransmitting its request) are handled rather than dropped
+        if not self.transport.reliable_send({'data': data.decode('utf-8')}, self.addr,
+                                            on_segment=self.handle_segment):
+            raise ConnectionError(f"Segment was not acknowledged by {self.addr}")
+
+    def recv(self) -> bytes:
+        while not self.ready and not self.peer_closed:
+            segment, addr = self.transport.receive_segment(timeout=self.listener.idle_timeout)
+            if segment:
+                self.handle_segment(segment, addr)
+            else:
+                # Nothing from the client for too long (it may have crashed),
+                # or the listener was closed
+                print(f"Connection with {self.addr} timed out")
+                self.peer_closed = True
+        return self.ready.popleft() if self.ready else b''
+
+    def handle_segment(self, segment: Segment, addr) -> None:
+        """Process a segment from our client, queueing any delivered data"""
+        if segment.flags == SegmentType.FIN:
+            self.transport.acknowledge_fin(segment, addr)
+            self.peer_closed = True
+        elif segment.flags == SegmentType.DATA:
+            for _, payload in self.transport.handle_received_data(segment, addr):
+                self.ready.append(payload['data'].encode('utf-8'))
+        elif segment.flags == SegmentType.PROBE:
+            self.transport.handle_probe(segment, addr)
+
+    def close(self) -> None:
+        if not self.peer_closed and self.transport.connected:
+            self.transport.send_fin(self.addr, on_segment=self.handle_segment)
+        self.transport.close()
+        self.listener.remove(self.addr)
+
+
+class UDPListener(Listener):
+    """
+    Accepts connections over our reliable transport.
+    
+    One receive thread reads the shared TransportServer socket and routes
+    each segment to the connection for its client address, so every
+    connection can be served on its own thread, like with TCP.
+    """
+    concurrent = True
+    # Seconds without hearing from a client before its connection is closed
+    idle_timeout = 60.0
+
+    def __init__(self, host, port, mss=None):
+        self.transport = TransportServer(host, port, mss)
+        self.connections = {}  # addr -> ServerConnection, including handshakes in progress
+        self.lock = threading.Lock()
+        # Connections whose handshake completed, waiting for accept()
+        self.accepted = queue.Queue()
+        self.closed = False
+        self.receiver = threading.Thread(target=self.receive_loop, daemon=True)
+        self.receiver.start()
+
+    def receive_loop(self):
+        """Read every segment from the shared socket and route it by client address"""
+        while not self.closed:
+            # Wake up regularly to notice when the listener is closed
+            segment, addr = self.transport.receive_segment(timeout=0.5)
+            if not segment:
+                continue
+            
+            with self.lock:
+                connection = self.connections.get(addr)
+                if connection is None and segment.flags == SegmentType.SYN:
+                    # New client - shake hands on its own thread, so a slow
+                    # handshake doesn't hold up everyone else
+                    connection = ServerConnection(self.transport, addr)
+                    self.connections[addr] = connection
+                    threading.Thread(target=self.handshake, args=(connection, segment), daemon=True).start()
+                    continue
+            
+            if connection:
+                connection.deliver(segment)
+            elif segment.flags == SegmentType.FIN:
+                # The connection is already gone, but our ACK of its FIN was lost
+                self.transport.acknowledge_fin(segment, addr)
+
+    def handshake(self, transport: ServerConnection, syn: Segment):
+        if transport.accept(syn):
+            self.accepted.put(UDPServerConnection(self, transport))
+        else:
+            self.remove(transport.addr)
+
+    def remove(self, addr):
+        """Forget a closed connection, so the receive thread stops routing to it"""
+        with self.lock:
+            self.connections.pop(addr, None)
+
+    def accept(self):
+        connection = self.accepted.get()
+        if connection is None:
+            raise OSError("Listener closed")
+        return connection, connection.addr
+
+    def getsockname(self):
+        return self.transport.socket.getsockname()
+
+    def close(self) -> None:
+        self.closed = True
+        self.accepted.put(None)
+        with self.lock:
+            for connection in self.connections.values():
+                connection.deliver(None)
+        self.receiver.join()
+        self.transport.close()
+
+
+class UDPBackend(TransportBackend):
+    """
+    Run the application protocol over our custom reliable UDP transport.
+
+    mss is the largest segment each side can receive (the transport's
+    DEFAULT_MSS if not given). Messages larger than the segment size found
+    by path MTU discovery are split across several segments.
+    """
+    name = 'udp'
+
+    def __init__(self, mss=None):
+        self.mss = mss
+
+    def connect(self, host, port) -> Connection:
+        transport = TransportClient(host, port, self.mss)
+        if not transport.connect():
+            transport.close()
+            raise ConnectionError(f"Could not connect to {host}:{port}")
+        return UDPClientConnection(transport)
+
+    def listen(self, host, port) -> Listener:
+        return UDPListener(host, port, self.mss)
+
+
+BACKENDS = {
+    TCPBackend.name: TCPBackend,
+    UDPBackend.name: UDPBackend,
+}
+
+
+def get_backend(name) -> TransportBackend:
+    """Look up a backend by name ('tcp' or 'udp')"""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown transport backend: {name}")
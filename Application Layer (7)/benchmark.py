@@ -0,0 +1,142 @@
+"""
+End-to-end benchmark of the application protocol over each transport backend.
+
+Runs a Server in a background thread and drives it with a Client, sending
+the same number of equally sized DATA messages over every backend, first
+one message per request and then coalesced into BATCH messages. For each
+run we report latency (time from send_message() until the message has been
+acknowledged) and throughput.
+
+The segments mode instead sends large messages over our UDP transport with
+different MSS settings, and reports throughput per segment size.
+
+Usage:
+    python benchmark.py [num_messages] [payload_size] [batch_bytes]
+    python benchmark.py segments [num_messages] [payload_size]
+"""
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+from backends import BACKENDS, UDPBackend
+from client import Client
+from server import Server
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of an already sorted list"""
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# MSS settings compared in segments mode: base size, Ethernet, 4K pages,
+# jumbo frames, and the largest possible UDP payload
+SEGMENT_SIZES = [1024, 1472, 4096, 8972, 16384, 65507]
+
+
+def make_backend(backend_name, mss=None):
+    return UDPBackend(mss) if mss else BACKENDS[backend_name]()
+
+
+def run_benchmark(backend_name, port, num_messages, payload_size, batch_bytes=None, mss=None):
+    """Send num_messages payloads over one backend and collect timings"""
+    server = Server(port=port, backend=make_backend(backend_name, mss))
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+
+    client = Client(port=port, backend=make_backend(backend_name, mss), batch_bytes=batch_bytes)
+    client.connect()
+    transport = getattr(client.connection, 'transport', None)
+    first_seq = transport.seq_num if transport else None
+
+    payload = 'x' * payload_size
+    latencies = []
+    queued_at = []
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        sent = time.perf_counter()
+        client.send_message(payload)
+        if batch_bytes is None:
+            latencies.append(time.perf_counter() - sent)
+        else:
+            # A batched message is done once the batch it went out in is acknowledged
+            queued_at.append(sent)
+            done = time.perf_counter()
+            for _ in client.drain_responses():
+                latencies.append(done - queued_at[len(latencies)])
+    if batch_bytes is not None:
+        client.flush()
+        done = time.perf_counter()
+        for _ in client.drain_responses():
+            latencies.append(done - queued_at[len(latencies)])
+    elapsed = time.perf_counter() - start
+    if transport:
+        segment_size = transport.segment_size
+        # Sequence numbers are 32 bits and may wrap around during the run
+        segments_per_message = (transport.seq_num - first_seq) % (1 << 32) / num_messages
+    client.close()
+    # Wait for the server to finish so it doesn't print over the results
+    server.close()
+    server_thread.join()
+
+    latencies.sort()
+    return {
+        'backend': backend_name,
+        'mode': f"batch {batch_bytes}B" if batch_bytes else 'single',
+        'messages': num_messages,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'msgs_per_sec': num_messages / elapsed,
+        'kb_per_sec': num_messages * payload_size / elapsed / 1024,
+        'segment_size': segment_size if transport else None,
+        'segments_per_message': segments_per_message if transport else None,
+    }
+
+
+def print_results(results, payload_size):
+    print(f"\nPayload size: {payload_size} bytes")
+    print(f"{'backend':<8} {'mode':<12} {'msgs':>6} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'msg/s':>10} {'KB/s':>10}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['mode']:<12} {r['messages']:>6} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} "
+              f"{r['p99_ms']:>9.3f} {r['msgs_per_sec']:>10.1f} {r['kb_per_sec']:>10.1f}")
+
+
+def print_segment_results(results, payload_size):
+    print(f"\nPayload size: {payload_size} bytes, UDP transport")
+    print(f"{'mss':>6} {'segment':>8} {'segs/msg':>9} {'mean ms':>9} {'p99 ms':>9} {'msg/s':>10} {'KB/s':>10}")
+    for mss, r in results:
+        print(f"{mss:>6} {r['segment_size']:>8} {r['segments_per_message']:>9.1f} {r['mean_ms']:>9.3f} "
+              f"{r['p99_ms']:>9.3f} {r['msgs_per_sec']:>10.1f} {r['kb_per_sec']:>10.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'segments':
+        num_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+        payload_size = int(sys.argv[3]) if len(sys.argv) > 3 else 32768
+
+        results = []
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for port, mss in enumerate(SEGMENT_SIZES, start=12450):
+                results.append((mss, run_benchmark('udp', port, num_messages, payload_size, mss=mss)))
+
+        print_segment_results(results, payload_size)
+        sys.exit()
+
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    payload_size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    batch_bytes = int(sys.argv[3]) if len(sys.argv) > 3 else 512
+
+    results = []
+    port = 12400
+    # Both layers print every message/segment; silence them while timing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for backend_name in BACKENDS:
+            for batch in (None, batch_bytes):
+                results.append(run_benchmark(backend_name, port, num_messages, payload_size, batch))
+                port += 1
+
+    print_results(results, payload_size)
@@ -1,24 +1,45 @@
-import socket
+import json
+import sys
+import threading
 from protocol import Message
+from backends import TCPBackend, get_backend
 
 class Client:
-    def __init__(self, host='localhost', port=12345):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def __init__(self, host='localhost', port=12345, backend=None, batch_delay=None, batch_bytes=None):
+        # The transport backend decides what carries our messages
+        # (OS TCP by default, or our custom reliable UDP transport)
+        self.backend = backend or TCPBackend()
+        self.connection = None
         self.host = host
         self.port = port
         
+        # Optional Nagle-style coalescing. When enabled, send_message() only
+        # queues the payload; queued payloads go out together in one BATCH
+        # once batch_bytes are waiting or batch_delay seconds have passed
+        # since the first one was queued.
+        self.batch_delay = batch_delay
+        self.batch_bytes = batch_bytes
+        self.pending = []
+        self.pending_bytes = 0
+        self.flush_timer = None
+        self.flush_error = None  # Raised by the next call after a failed timed flush
+        self.responses = []  # Per-payload responses of batched messages, see drain_responses()
+        # The flush timer runs on its own thread, so only one thread may
+        # use the connection at a time
+        self.lock = threading.Lock()
+        
     def connect(self):
-        print(f"Connecting to {self.host}:{self.port}")
-        self.socket.connect((self.host, self.port))
+        print(f"Connecting to {self.host}:{self.port} over {self.backend.name}")
+        self.connection = self.backend.connect(self.host, self.port)
         
         # Perform handshake
         print("Sending CONNECT message")
         handshake = Message('CONNECT', 'Requesting connection')
-        self.socket.send(handshake.encode())
+        self.connection.send(handshake.encode())
         
         # Wait for acceptance
         print("Waiting for server response")
-        data = self.socket.recv(1024)
+        data = self.connection.recv()
         if not data:
             raise ConnectionError("No response from server")
             
@@ -31,11 +52,99 @@ class Client:
         print("Connected to server!")
         
     def send_message(self, payload):
-        message = Message('DATA', payload)
-        self.socket.send(message.encode())
+        """
+        Send a DATA message and return the server's response.
+        
+        If coalescing is enabled the payload is queued instead and None is
+        returned; its response ({'type', 'payload'}, with type 'ERROR' if
+        the server's handler failed) is added to self.responses once the
+        batch it went out in has been acknowledged.
+        """
+        if self.batch_delay is None and self.batch_bytes is None:
+            return self._request(Message('DATA', payload))
+        
+        with self.lock:
+            self._raise_flush_error()
+            self.pending.append(payload)
+            self.pending_bytes += len(json.dumps(payload))
+            full = self.batch_bytes is not None and self.pending_bytes >= self.batch_bytes
+            
+            # Start the coalescing window when the first message is queued
+            if not full and self.flush_timer is None and self.batch_delay is not None:
+                self.flush_timer = threading.Timer(self.batch_delay, self._timed_flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+        
+        if full:
+            self.flush()
+        return None
+        
+    def flush(self):
+        """
+        Send all queued payloads as one BATCH message.
+        
+        If the batch can't be sent the payloads stay queued, so a later
+        flush() sends them again.
+        
+        Returns:
+            The responses to this batch's payloads (also added to
+            self.responses), or None if nothing was queued
+        """
+        with self.lock:
+            self._raise_flush_error()
+            if self.flush_timer:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.pending:
+                return None
+            
+            payloads = self.pending
+            self.pending = []
+            self.pending_bytes = 0
+            
+            try:
+                response = self._request(Message('BATCH', payloads))
+            except Exception:
+                # Put them back in front of anything queued since
+                self.pending = payloads + self.pending
+                self.pending_bytes = sum(len(json.dumps(p)) for p in self.pending)
+                raise
+            if response['type'] != 'BATCH_ACK':
+                raise Exception(f"Batch rejected: {response['payload']}")
+            self.responses.extend(response['payload'])
+            return response['payload']
+        
+    def drain_responses(self):
+        """Return and forget the responses collected from batches so far"""
+        with self.lock:
+            responses = self.responses
+            self.responses = []
+            return responses
+        
+    def _timed_flush(self):
+        """
+        Flush from the coalescing timer's thread. Nobody is there to catch
+        an error, so keep it for the next send_message(), flush() or close().
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            with self.lock:
+                self.flush_error = e
+        
+    def _raise_flush_error(self):
+        """Raise the error of a failed timed flush, if any. Needs self.lock."""
+        if self.flush_error:
+            error = self.flush_error
+            self.flush_error = None
+            raise error
+        
+    def _request(self, message):
+        """Send a message and wait for the server's response"""
+        self.connection.send(message.encode())
         
         # Wait for acknowledgment
-        data = self.socket.recv(1024)
+        data = self.connection.recv()
         if not data:
             raise ConnectionError("No response from server")
             
@@ -43,11 +152,18 @@ class Client:
         return response
         
     def close(self):
-        self.socket.close()
+        if self.connection:
+            try:
+                # Don't lose messages still waiting in the coalescing window
+                self.flush()
+            finally:
+                self.connection.close()
         print("Connection closed")
 
 if __name__ == "__main__":
-    client = Client()
+    # Usage: python client.py [tcp|udp]
+    backend = get_backend(sys.argv[1]) if len(sys.argv) > 1 else TCPBackend()
+    client = Client(backend=backend)
     
     try:
         client.connect()
@@ -60,4 +176,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        client.close()
\ No newline at end of file
+        client.close()
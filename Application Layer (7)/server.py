@@ -1,53 +1,298 @@
-import socket
+import asyncio
+import inspect
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from protocol import Message
+from backends import TCPBackend, get_backend
+
+def echo(payload):
+    """Default DATA handler - echo the payload back"""
+    return payload
+
+# Event loop for async handlers run in this (worker) process, see run_handler
+worker_loop = None
+
+def run_handler(handler, payload):
+    """
+    Call a handler in a process pool worker, running it to completion if
+    it's an async handler.
+    
+    This is a module-level function so it can be sent to a process pool.
+    Each worker process keeps a single event loop for all async handlers it
+    runs, so they can share loop-bound resources such as client sessions.
+    """
+    global worker_loop
+    result = handler(payload)
+    if inspect.iscoroutine(result):
+        if worker_loop is None:
+            worker_loop = asyncio.new_event_loop()
+        result = worker_loop.run_until_complete(result)
+    return result
 
 class Server:
-    def __init__(self, host='localhost', port=12345):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.bind((host, port))
+    def __init__(self, host='localhost', port=12345, backend=None, workers=None):
+        self.backend = backend or TCPBackend()
+        self.listener = self.backend.listen(host, port)
+        
+        # Request handlers, keyed by message type
+        self.handlers = {}  # msg_type -> {handler, executor, response_type, slots}
+        # Worker pools are only created once a handler needs them
+        self.workers = workers
+        self.pools = {}  # 'thread'/'process' -> Executor
+        self.pools_lock = threading.Lock()
+        # Event loop (on its own thread) shared by all async handlers
+        self.loop = None
+        # Per-handler latency metrics
+        self.metrics = {}  # msg_type -> {count, errors, total_time, max_time}
+        self.metrics_lock = threading.Lock()
+        
+        self.register_handler('DATA', echo)
+        
+    def register_handler(self, msg_type, handler, executor=None, max_pending=None, response_type='ACK'):
+        """
+        Register the handler for a message type.
+        
+        Args:
+            msg_type: Message type the handler answers, e.g. 'DATA'
+            handler: Called with the message payload, returns the response
+                payload. May be a regular function or an async function.
+                Async handlers run on the server's event loop, concurrently
+                with each other, unless executor is 'process'.
+            executor: None to run the handler inline on the connection's
+                thread, 'thread' for the thread pool or 'process' for the
+                process pool (handler must then be a module-level function).
+                Offloaded handlers don't hold up the connection: it keeps
+                reading while they run, and their responses are sent in
+                request order as they finish.
+            max_pending: Maximum number of requests queued or running for
+                this handler. Further requests wait for a free slot, which
+                slows down the clients sending them (backpressure).
+            response_type: Message type of the response
+        """
+        if executor not in (None, 'thread', 'process'):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.handlers[msg_type] = {
+            'handler': handler,
+            'executor': executor,
+            'response_type': response_type,
+            'slots': threading.BoundedSemaphore(max_pending) if max_pending else None
+        }
+        
+    def get_metrics(self):
+        """Return a snapshot of the latency metrics (in seconds) of every handler"""
+        with self.metrics_lock:
+            return {
+                msg_type: dict(m, avg_time=m['total_time'] / m['count'] if m['count'] else 0.0)
+                for msg_type, m in self.metrics.items()
+            }
+        
+    def _get_pool(self, executor):
+        if executor is None:
+            return None
+        # Connection threads may ask for the same pool at once, only create it once
+        with self.pools_lock:
+            if executor not in self.pools:
+                pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+                self.pools[executor] = pool_class(max_workers=self.workers)
+            return self.pools[executor]
+        
+    def _get_loop(self):
+        """Return the event loop for async handlers, starting it on first use"""
+        with self.pools_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, daemon=True).start()
+            return self.loop
+        
+    def _submit(self, msg_type, payload) -> Future:
+        """Start the handler for a message and return a Future for its result"""
+        entry = self.handlers.get(msg_type)
+        if entry is None:
+            raise ValueError(f"Unknown message type: {msg_type}")
+        
+        # Wait for a free slot if this handler is already at its limit
+        if entry['slots']:
+            entry['slots'].acquire()
+        started = time.perf_counter()
+        
+        handler = entry['handler']
+        if entry['executor'] == 'process':
+            future = self._get_pool('process').submit(run_handler, handler, payload)
+        elif inspect.iscoroutinefunction(handler):
+            future = asyncio.run_coroutine_threadsafe(handler(payload), self._get_loop())
+        elif entry['executor'] == 'thread':
+            future = self._get_pool('thread').submit(handler, payload)
+        else:
+            future = Future()
+            try:
+                future.set_result(handler(payload))
+            except Exception as e:
+                future.set_exception(e)
+        
+        future.add_done_callback(lambda f: self._finish(msg_type, entry, started, f))
+        return future
+        
+    def _finish(self, msg_type, entry, started, future):
+        """Release the handler's slot and record how long the request took"""
+        if entry['slots']:
+            entry['slots'].release()
+        elapsed = time.perf_counter() - started
+        with self.metrics_lock:
+            m = self.metrics.setdefault(msg_type, {'count': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0})
+            m['count'] += 1
+            m['errors'] += 1 if future.exception() else 0
+            m['total_time'] += elapsed
+            m['max_time'] = max(m['max_time'], elapsed)
+        
+    def _batch_result(self, future):
+        """
+        Build the BATCH_ACK entry for one payload, so a failing payload
+        doesn't fail the rest of its batch
+        """
+        try:
+            return {'type': self.handlers['DATA']['response_type'], 'payload': future.result()}
+        except Exception as e:
+            return {'type': 'ERROR', 'payload': str(e)}
+        
+    def handle_message(self, message) -> Future:
+        """
+        Start the registered handler for a message.
+        
+        Returns:
+            Future for the response Message. It is completed from the
+            handlers' done callbacks, so no thread waits for them to finish.
+        """
+        response = Future()
+        try:
+            if message['type'] == 'BATCH':
+                # Start every payload first so pooled handlers run in parallel,
+                # then send one acknowledgment for the whole group
+                futures = [self._submit('DATA', payload) for payload in message['payload']]
+                build = lambda: Message('BATCH_ACK', [self._batch_result(f) for f in futures])
+            else:
+                response_type = self.handlers.get(message['type'], {}).get('response_type')
+                futures = [self._submit(message['type'], message['payload'])]
+                build = lambda: Message(response_type, futures[0].result())
+        except Exception as e:
+            response.set_result(Message('ERROR', str(e)))
+            return response
+        
+        remaining = [len(futures)]
+        lock = threading.Lock()
+        
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            try:
+                response.set_result(build())
+            except Exception as e:
+                response.set_result(Message('ERROR', str(e)))
+        
+        if not futures:
+            done(None)
+        for future in futures:
+            future.add_done_callback(done)
+        return response
         
     def start(self):
-        self.socket.listen()
-        print(f"Server listening on {self.socket.getsockname()}")
+        print(f"Server listening on {self.listener.getsockname()} over {self.backend.name}")
         
+        clients = []
         while True:
-            client_socket, address = self.socket.accept()
+            try:
+                connection, address = self.listener.accept()
+            except OSError:
+                # close() shut down the listener
+                break
             print(f"Connection from {address}")
             
-            try:
-                # Handle handshake
-                data = client_socket.recv(1024)
-                if not data:
-                    continue
-                    
-                message = Message.decode(data)
-                print(f"Received message: {message}")
+            if self.listener.concurrent:
+                # Serve each client on its own thread so a slow request
+                # doesn't hold up everyone else
+                client = threading.Thread(target=self.handle_client, args=(connection, address), daemon=True)
+                client.start()
+                clients = [c for c in clients if c.is_alive()] + [client]
+            else:
+                self.handle_client(connection, address)
+        
+        # Return only once the clients still connected are done
+        for client in clients:
+            client.join()
                 
-                if message['type'] == 'CONNECT':
-                    # Send acceptance
-                    response = Message('ACCEPT', 'Connection established')
-                    client_socket.send(response.encode())
-                    print("Sent ACCEPT response")
-                    
-                    # Handle client messages
-                    while True:
-                        data = client_socket.recv(1024)
-                        if not data:
-                            break
-                            
-                        message = Message.decode(data)
-                        print(f"Received: {message}")
-                        
-                        # Echo back with acknowledgment
-                        response = Message('ACK', message['payload'])
-                        client_socket.send(response.encode())
+    def handle_client(self, connection, address):
+        # Responses are sent by a writer thread, so this thread can keep
+        # reading while handlers run
+        responses = queue.Queue()
+        writer = None
+        try:
+            # Handle handshake
+            data = connection.recv()
+            if not data:
+                return
+                
+            message = Message.decode(data)
+            print(f"Received message: {message}")
+            
+            if message['type'] == 'CONNECT':
+                # Send acceptance
+                response = Message('ACCEPT', 'Connection established')
+                connection.send(response.encode())
+                print("Sent ACCEPT response")
+                
+                writer = threading.Thread(target=self.write_responses, args=(connection, responses), daemon=True)
+                writer.start()
+                
+                # Handle client messages
+                while True:
+                    data = connection.recv()
+                    if not data:
+                        break
                         
+                    message = Message.decode(data)
+                    print(f"Received: {message}")
+                    
+                    responses.put(self.handle_message(message))
+                    
+        except Exception as e:
+            print(f"Error handling client: {e}")
+        finally:
+            if writer:
+                # Let the writer send the responses still being worked on
+                responses.put(None)
+                writer.join()
+            connection.close()
+            print(f"Connection closed with {address}")
+            
+    def write_responses(self, connection, responses):
+        """Send each response once its handler has finished, in request order"""
+        while True:
+            future = responses.get()
+            if future is None:
+                return
+            try:
+                connection.send(future.result().encode())
             except Exception as e:
-                print(f"Error handling client: {e}")
-            finally:
-                client_socket.close()
-                print(f"Connection closed with {address}")
+                print(f"Error sending response: {e}")
+                return
+            
+    def close(self):
+        """Stop the worker pools, the event loop and the listener"""
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.listener.close()
 
 if __name__ == "__main__":
-    server = Server()
-    server.start()
\ No newline at end of file
+    # Usage: python server.py [tcp|udp]
+    backend = get_backend(sys.argv[1]) if len(sys.argv) > 1 else TCPBackend()
+    server = Server(backend=backend)
+    try:
+        server.start()
+    finally:
+        server.close()
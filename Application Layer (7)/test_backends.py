@@ -0,0 +1,57 @@
+import threading
+import time
+import unittest
+
+from backends import UDPBackend
+from client import Client
+from server import Server
+
+class UDPBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(port=0, backend=UDPBackend())
+        self.port = self.server.listener.getsockname()[1]
+        threading.Thread(target=self.server.start, daemon=True).start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.close()
+
+    def connect(self):
+        client = Client(port=self.port, backend=UDPBackend())
+        client.connect()
+        self.clients.append(client)
+        return client
+
+    def test_clients_are_served_concurrently(self):
+        first = self.connect()
+        # Connecting must not wait for the first client to disconnect
+        second = self.connect()
+        self.assertEqual(second.send_message('b')['payload'], 'b')
+        self.assertEqual(first.send_message('a')['payload'], 'a')
+
+    def test_close_removes_connection(self):
+        client = self.connect()
+        client.send_message('x')
+        self.clients.remove(client)
+        client.close()
+        deadline = time.time() + 5
+        while self.server.listener.connections and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.listener.connections, {})
+
+    def test_silent_client_times_out(self):
+        self.server.listener.idle_timeout = 0.2
+        client = self.connect()
+        client.send_message('x')
+        # The client disappears without sending a FIN
+        self.clients.remove(client)
+        client.connection.transport.socket.close()
+        deadline = time.time() + 5
+        while self.server.listener.connections and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.listener.connections, {})
+
+if __name__ == '__main__':
+    unittest.main()
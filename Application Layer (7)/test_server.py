@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from backends import BACKENDS
+from protocol import Message
+from server import Server
+
+def slow_echo(payload):
+    time.sleep(0.3)
+    return payload
+
+async def loop_id(payload):
+    await asyncio.sleep(0.3)
+    return id(asyncio.get_running_loop())
+
+class PipelinedRequestTest(unittest.TestCase):
+    """Requests sent back to back on one connection, without waiting for responses"""
+
+    def serve(self, backend_name):
+        server = Server(port=0, backend=BACKENDS[backend_name](), workers=4)
+        threading.Thread(target=server.start, daemon=True).start()
+        self.addCleanup(server.close)
+
+        connection = server.backend.connect('localhost', server.listener.getsockname()[1])
+        self.addCleanup(connection.close)
+        connection.send(Message('CONNECT', 'Requesting connection').encode())
+        self.assertEqual(Message.decode(connection.recv())['type'], 'ACCEPT')
+        return server, connection
+
+    def pipeline(self, connection, payloads):
+        started = time.perf_counter()
+        for payload in payloads:
+            connection.send(Message('DATA', payload).encode())
+        responses = [Message.decode(connection.recv()) for _ in payloads]
+        return responses, time.perf_counter() - started
+
+    def test_offloaded_handlers_run_while_connection_reads(self):
+        for backend_name in BACKENDS:
+            with self.subTest(backend=backend_name):
+                server, connection = self.serve(backend_name)
+                server.register_handler('DATA', slow_echo, executor='thread')
+                responses, elapsed = self.pipeline(connection, ['a', 'b', 'c', 'd'])
+                # Responses come back in request order
+                self.assertEqual([r['payload'] for r in responses], ['a', 'b', 'c', 'd'])
+                # All four handlers ran at once, not one after the other
+                self.assertLess(elapsed, 1.0)
+
+    def test_async_handlers_share_one_event_loop(self):
+        for backend_name in BACKENDS:
+            with self.subTest(backend=backend_name):
+                server, connection = self.serve(backend_name)
+                server.register_handler('DATA', loop_id)
+                responses, elapsed = self.pipeline(connection, [1, 2, 3])
+                self.assertEqual(len({r['payload'] for r in responses}), 1)
+                self.assertLess(elapsed, 0.8)
+
+if __name__ == '__main__':
+    unittest.main()
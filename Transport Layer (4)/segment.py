@@ -10,6 +10,8 @@ class SegmentType(Enum):
     ACK = "ACK"           # Acknowledge - Confirm receipt
     DATA = "DATA"         # Data - Carry payload
     FIN = "FIN"          # Finish - End connection
+    PROBE = "PROBE"       # Probe - Padded segment to test a larger segment size
+    PROBE_ACK = "PROBE_ACK"  # Probe-Acknowledge - Probe arrived, size works
 
 @dataclass
 class Segment:
@@ -18,6 +20,10 @@ class Segment:
     ack_num: int
     flags: SegmentType
     payload: Optional[Dict[str, Any]] = None
+    stream_id: int = 0   # Stream this segment belongs to (like QUIC stream IDs)
+    stream_seq: int = 0  # Position of this segment within its stream
+    more_fragments: bool = False  # Payload continues in the next segment of the stream
+    stream_reset: bool = False  # Sender gave up on earlier stream positions, skip to this one
 
     def to_bytes(self) -> bytes:
         """Convert segment to bytes for transmission"""
@@ -25,7 +31,11 @@ class Segment:
             "seq_num": self.seq_num,
             "ack_num": self.ack_num,
             "flags": self.flags.value,
-            "payload": self.payload
+            "payload": self.payload,
+            "stream_id": self.stream_id,
+            "stream_seq": self.stream_seq,
+            "more_fragments": self.more_fragments,
+            "stream_reset": self.stream_reset
         }
         return json.dumps(data).encode('utf-8')
     
@@ -38,7 +48,11 @@ class Segment:
                 seq_num=decoded["seq_num"],
                 ack_num=decoded["ack_num"],
                 flags=SegmentType(decoded["flags"]),
-                payload=decoded.get("payload")
+                payload=decoded.get("payload"),
+                stream_id=decoded.get("stream_id", 0),
+                stream_seq=decoded.get("stream_seq", 0),
+                more_fragments=decoded.get("more_fragments", False),
+                stream_reset=decoded.get("stream_reset", False)
             )
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid segment format: {e}")
@@ -0,0 +1,94 @@
+import json
+import re
+import unittest
+
+from transport import BASE_SEGMENT_SIZE, TransportBase
+from window import seq_add
+
+class FragmentPayloadTest(unittest.TestCase):
+    def setUp(self):
+        self.sender = TransportBase()
+        self.receiver = TransportBase()
+        # Only the payload handling is under test, don't send any ACKs
+        self.receiver.send_segment = lambda segment, addr: None
+        self.sender.segment_size = BASE_SEGMENT_SIZE
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def send_through(self, payload):
+        """Fragment payload, check every segment fits and return what the receiver delivers"""
+        delivered = []
+        pieces = self.sender.fragment_payload(payload)
+        for piece, more_fragments in pieces:
+            self.assertTrue(piece.get('fragment', 'x'), "Empty fragment")
+            if 'fragment' in piece:
+                # An odd number of trailing backslashes means an escape sequence was cut
+                trailing = len(piece['fragment']) - len(piece['fragment'].rstrip('\\'))
+                self.assertEqual(trailing % 2, 0, "Fragment ends inside an escape sequence")
+                self.assertIsNone(re.search(r'\\u[0-9a-fA-F]{0,3}$', piece['fragment']))
+            segment = self.sender.create_data_segment(piece, 0, more_fragments)
+            self.assertLessEqual(len(segment.to_bytes()), self.sender.segment_size)
+            delivered.extend(self.receiver.handle_received_data(segment, None))
+            self.sender.seq_num = seq_add(self.sender.seq_num, 1)
+        return pieces, delivered
+
+    def test_small_payload_is_not_fragmented(self):
+        pieces, delivered = self.send_through({'d': 'hello'})
+        self.assertEqual(len(pieces), 1)
+        self.assertEqual(delivered, [(0, {'d': 'hello'})])
+
+    def test_escape_heavy_payloads(self):
+        for text in ['"' * 5000, '\\' * 5000, '\\"' * 3000, 'é"\\' * 2000, json.dumps({'d': '"' * 400})]:
+            with self.subTest(text=text[:8]):
+                pieces, delivered = self.send_through({'d': text})
+                self.assertGreater(len(pieces), 1)
+                self.assertEqual(delivered, [(0, {'d': text})])
+
+class AbandonedSegmentTest(unittest.TestCase):
+    def setUp(self):
+        self.sender = TransportBase()
+        self.receiver = TransportBase()
+        self.receiver.send_segment = lambda segment, addr: None
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def next_segment(self, piece, more_fragments=False):
+        segment = self.sender.create_data_segment(piece, 0, more_fragments)
+        self.sender.unacked_segments.add(segment, None, 0.0)
+        self.sender.seq_num = seq_add(self.sender.seq_num, 1)
+        return segment
+
+    def test_stream_continues_after_abandoned_fragment(self):
+        # Only the first fragment of a payload arrives, the sender gives up on the second
+        first = self.next_segment({'fragment': '{"d": "aa'}, True)
+        lost = self.next_segment({'fragment': 'aa"}'}, False)
+        self.assertEqual(self.receiver.handle_received_data(first, None), [])
+        self.sender.unacked_segments.ack(first.seq_num)
+        self.sender.abandon_segment(lost.seq_num)
+        self.assertEqual(len(self.sender.unacked_segments), 0)
+
+        following = self.next_segment({'d': 'b'})
+        self.assertTrue(following.stream_reset)
+        self.assertEqual(self.receiver.handle_received_data(following, None), [(0, {'d': 'b'})])
+        self.assertFalse(self.next_segment({'d': 'c'}).stream_reset)
+
+    def test_late_segment_after_reset_is_ignored(self):
+        lost = self.next_segment({'d': 'a'})
+        ahead = self.next_segment({'d': 'b'})
+        # b arrives and waits for a, which the sender then gives up on
+        self.assertEqual(self.receiver.handle_received_data(ahead, None), [])
+        self.sender.abandon_segment(lost.seq_num)
+        self.sender.abandon_segment(ahead.seq_num)
+
+        following = self.next_segment({'d': 'c'})
+        self.assertEqual(self.receiver.handle_received_data(following, None), [(0, {'d': 'c'})])
+        self.assertIsNone(self.receiver.streams[0]['receive_window'])
+        # A retransmission of the abandoned segment arriving late is a duplicate
+        self.assertEqual(self.receiver.handle_received_data(lost, None), [])
+
+if __name__ == '__main__':
+    unittest.main()
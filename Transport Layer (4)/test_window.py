@@ -0,0 +1,76 @@
+import unittest
+
+from segment import Segment, SegmentType
+from window import SEQ_SPACE, ReceiveWindow, SendWindow, seq_add
+
+def data(seq):
+    return Segment(seq_num=seq, ack_num=0, flags=SegmentType.DATA, stream_id=0, payload={'n': seq})
+
+class SendWindowTest(unittest.TestCase):
+    def setUp(self):
+        self.window = SendWindow(capacity=8)
+
+    def add(self, *seqs):
+        for seq in seqs:
+            self.window.add(data(seq), None, 0.0)
+
+    def test_segment_behind_base_is_rejected(self):
+        self.add(10, 11)
+        with self.assertRaises(ValueError):
+            self.add(5)
+        self.window.ack(10)
+        self.window.ack(11)
+        self.assertEqual(len(self.window), 0)
+        self.assertEqual(self.window.outstanding(), [])
+
+    def test_window_empties_before_reaching_back(self):
+        self.add(10)
+        self.window.ack(10)
+        # Nothing is outstanding, so the window restarts at any sequence number
+        self.add(5)
+        self.assertEqual(self.window.outstanding(), [5])
+
+    def test_out_of_order_acks_across_wraparound(self):
+        seqs = [seq_add(SEQ_SPACE - 3, i) for i in range(6)]  # 2^32-3 .. 2
+        self.add(*seqs)
+        self.assertEqual(self.window.outstanding(), seqs)
+
+        # Acknowledging later segments leaves base on the oldest one
+        self.window.ack(0)
+        self.window.ack(SEQ_SPACE - 2)
+        self.assertEqual(self.window.base, SEQ_SPACE - 3)
+        self.assertEqual(self.window.outstanding(), [SEQ_SPACE - 3, SEQ_SPACE - 1, 1, 2])
+
+        # Once it is acknowledged, base slides across the wrap to 1
+        self.window.ack(SEQ_SPACE - 3)
+        self.window.ack(SEQ_SPACE - 1)
+        self.assertEqual(self.window.base, 1)
+        self.assertEqual(self.window.outstanding(), [1, 2])
+        self.assertNotIn(SEQ_SPACE - 1, self.window)
+        with self.assertRaises(ValueError):
+            self.add(SEQ_SPACE - 1)
+
+        self.window.ack(1)
+        self.window.ack(2)
+        self.assertEqual(len(self.window), 0)
+        self.assertEqual(self.window.outstanding(), [])
+
+class ReceiveWindowTest(unittest.TestCase):
+    def test_delivers_in_order_across_wraparound(self):
+        window = ReceiveWindow(capacity=8, expected=SEQ_SPACE - 2)
+        for seq in (1, 0, SEQ_SPACE - 1):
+            self.assertTrue(window.offer(data(seq), seq))
+        # Nothing can be delivered until the first segment arrives
+        self.assertEqual(window.pop_ready(), [])
+        self.assertTrue(window.offer(data(SEQ_SPACE - 2), SEQ_SPACE - 2))
+
+        ready = window.pop_ready()
+        self.assertEqual([s.seq_num for s in ready], [SEQ_SPACE - 2, SEQ_SPACE - 1, 0, 1])
+        self.assertEqual(window.expected, 2)
+        self.assertEqual(len(window), 0)
+        # A duplicate from before the wrap is accepted but not buffered again
+        self.assertTrue(window.offer(data(SEQ_SPACE - 1), SEQ_SPACE - 1))
+        self.assertEqual(len(window), 0)
+
+if __name__ == '__main__':
+    unittest.main()
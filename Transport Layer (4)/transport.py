@@ -1,9 +1,28 @@
+import json
+import queue
+import re
 import socket
 import random
 import time
-from typing import Optional, Tuple, Dict, Any, List
+from typing import Optional, Tuple, Dict, Any, List, Callable
 from collections import deque
 from segment import Segment, SegmentType
+from window import SEQ_SPACE, SendWindow, ReceiveWindow, seq_add, seq_diff
+
+# Segment sizes are measured as the size of the encoded segment (the UDP payload)
+BASE_SEGMENT_SIZE = 1024  # Assumed to work on every path, and all a peer that doesn't announce an MSS can receive
+DEFAULT_MSS = 1472        # 1500-byte Ethernet MTU minus IP (20) and UDP (8) headers
+MAX_MSS = 65507           # Largest possible UDP payload
+PROBE_GRANULARITY = 32    # Stop searching for the path MTU once within this many bytes
+MIN_PROBE_TIMEOUT = 0.05  # Seconds, lower bound on the RTT-based probe timeout
+
+# Splits JSON text into escape sequences (kept whole when fragmenting) and
+# runs of other characters
+JSON_TOKENS = re.compile(r'\\u[0-9a-fA-F]{4}|\\.|[^\\]+')
+
+def escaped_size(text: str) -> int:
+    """Length of text once it is JSON-encoded as a string, without the quotes"""
+    return len(json.dumps(text)) - 2
 
 class TransportBase:
     """
@@ -16,16 +35,25 @@ class TransportBase:
     - In-order delivery of data
     - Buffer management for out-of-order segments
     - Timeout and retransmission handling
+    - Multiple independent streams per connection (like QUIC)
+    - MSS negotiation and path MTU discovery (like RFC 8899)
     """
-    def __init__(self, host='localhost', port=12345):
-        # Create UDP socket - we'll build TCP-like features on top of this
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    def __init__(self, host='localhost', port=12345, mss=None, sock=None):
+        # Create UDP socket - we'll build TCP-like features on top of this.
+        # Connections accepted by a server share its socket instead.
+        self.socket = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.host = host
         self.port = port
         
+        # Never let IP fragment our segments - if one is too big for the path
+        # we want it dropped, so path MTU discovery notices (Linux only)
+        if sock is None and hasattr(socket, 'IP_MTU_DISCOVER'):
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MTU_DISCOVER, socket.IP_PMTUDISC_DO)
+        
         # Initialize sequence number randomly (like TCP does)
-        # This helps prevent sequence number conflicts between connections
-        self.seq_num = random.randint(0, 1000)
+        # This helps prevent sequence number conflicts between connections.
+        # Sequence numbers are 32 bits and wrap around to 0.
+        self.seq_num = random.randint(0, SEQ_SPACE - 1)
         
         # Track the next expected sequence number for incoming data
         self.expected_seq = None
@@ -37,13 +65,41 @@ class TransportBase:
         self.timeout = 5.0  # seconds to wait before retransmission
         self.max_retries = 3  # maximum number of retransmission attempts
         
+        # Stream management (like QUIC streams)
+        # Each stream is ordered and reassembled on its own, so a lost segment
+        # only holds back its own stream. Sequence numbers, acknowledgments and
+        # the window below are shared by the whole connection.
+        self.streams = {}  # stream_id -> {send_seq, resync, expected_seq, receive_window, fragments}
+        
         # Buffer management
-        # Store out-of-order segments until they can be processed
-        self.receive_buffer = {}  # seq_num -> segment
+        # Send and receive buffers are fixed-capacity ring buffers indexed by
+        # sequence number, so they hold at most this many segments (power of two)
+        self.buffer_capacity = 1024
+        # Streams only get a (smaller) receive buffer while segments are out of order
+        self.stream_buffer_capacity = 64
         # Track segments waiting for acknowledgment
-        self.unacked_segments = {}  # seq_num -> {segment, addr, timestamp}
+        self.unacked_segments = SendWindow(self.buffer_capacity)
         # Simple flow control - fixed window size
         self.window_size = 4  # number of segments that can be sent without acknowledgment
+        
+        # Segment sizing
+        # local_mss is the largest segment we can receive, announced in the
+        # handshake. mss is the negotiated maximum for the connection and
+        # segment_size is what path MTU discovery found actually gets through.
+        self.local_mss = mss or DEFAULT_MSS
+        if not BASE_SEGMENT_SIZE <= self.local_mss <= MAX_MSS:
+            raise ValueError(f"MSS must be between {BASE_SEGMENT_SIZE} and {MAX_MSS}")
+        self.mss = BASE_SEGMENT_SIZE
+        self.segment_size = BASE_SEGMENT_SIZE
+        self.probe_timeout = 1.0  # seconds to wait for a PROBE_ACK, lowered once the RTT is known
+        self.probe_budget = 2.0  # longest a single path MTU search may take, in seconds
+        self.probe_interval = 600.0  # seconds between attempts to grow segment_size
+        self.last_probe = 0.0
+        
+        # Size the socket's receive buffer to hold a full window of our largest segments
+        rcvbuf = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if rcvbuf < self.window_size * self.local_mss:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.window_size * self.local_mss)
 
     def send_segment(self, segment: Segment, addr: Tuple[str, int]) -> None:
         """
@@ -54,7 +110,8 @@ class TransportBase:
             addr: Tuple of (host, port) to send to
             
         If the segment is a DATA segment, it's stored in unacked_segments for
-        potential retransmission if acknowledgment isn't received.
+        potential retransmission if acknowledgment isn't received. Sending
+        a segment that is already stored counts as a retransmission.
         """
         try:
             print(f"Sending {segment.flags.value} segment (SEQ={segment.seq_num}, ACK={segment.ack_num})")
@@ -62,11 +119,7 @@ class TransportBase:
             
             # Store data segments for potential retransmission
             if segment.flags == SegmentType.DATA:
-                self.unacked_segments[segment.seq_num] = {
-                    'segment': segment,
-                    'addr': addr,
-                    'timestamp': time.time()
-                }
+                self.unacked_segments.add(segment, addr, time.time())
         except Exception as e:
             print(f"Error sending segment: {e}")
             raise
@@ -84,7 +137,8 @@ class TransportBase:
         try:
             if timeout:
                 self.socket.settimeout(timeout)
-            data, addr = self.socket.recvfrom(1024)
+            # Peers never send segments larger than the MSS we announced
+            data, addr = self.socket.recvfrom(self.local_mss)
             segment = Segment.from_bytes(data)
             print(f"Received {segment.flags.value} segment (SEQ={segment.seq_num}, ACK={segment.ack_num})")
             return segment, addr
@@ -97,7 +151,178 @@ class TransportBase:
             if timeout:
                 self.socket.settimeout(None)
 
-    def reliable_send(self, payload: Dict, addr: Tuple[str, int]) -> bool:
+    def receive_ack(self, timeout: float = None) -> Tuple[Optional[Segment], Optional[Tuple[str, int]]]:
+        """
+        Receive a segment while waiting for an acknowledgment. This is just
+        receive_segment, except on connections that route ACKs to the
+        sending thread separately (see ServerConnection).
+        """
+        return self.receive_segment(timeout)
+
+    def get_stream(self, stream_id: int) -> Dict:
+        """
+        Return the state for a stream, creating it the first time it is used.
+        
+        Streams don't need their own handshake - either side can start
+        sending on a new stream ID at any time.
+        """
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            # setdefault, since a sending and a receiving thread may both get here first
+            stream = self.streams.setdefault(stream_id, {
+                'send_seq': 0,  # Next stream sequence number to send
+                'resync': False,  # Whether the peer must skip positions we gave up on
+                'expected_seq': 0,  # Next stream sequence number to deliver
+                'receive_window': None,  # Out-of-order segments, only while there are any
+                'fragments': []  # Pieces of a payload still being reassembled
+            })
+        return stream
+
+    def order_stream_segment(self, stream: Dict, segment: Segment) -> Optional[List[Segment]]:
+        """
+        Put a received segment in order within its stream.
+        
+        Segments that arrive in order are passed straight through. A stream
+        only gets a receive window once a segment arrives ahead of a gap, and
+        loses it again as soon as the gap has been filled.
+        
+        A segment marked with stream_reset starts a new message after the
+        sender gave up on earlier ones. Anything still missing or buffered
+        before it, including a partly reassembled payload, is discarded.
+        
+        Returns:
+            The segments that can now be delivered, in order (empty for a
+            duplicate or a buffered segment), or None if the segment is too
+            far ahead to buffer
+        """
+        if segment.stream_reset and seq_diff(segment.stream_seq, stream['expected_seq']) >= 0:
+            print(f"Stream {segment.stream_id} skipping to {segment.stream_seq}")
+            stream['fragments'] = []
+            if stream['receive_window'] is not None:
+                stream['receive_window'].skip_to(segment.stream_seq)
+                if not len(stream['receive_window']):
+                    stream['receive_window'] = None
+            stream['expected_seq'] = segment.stream_seq
+
+        window = stream['receive_window']
+        if window is None:
+            distance = seq_diff(segment.stream_seq, stream['expected_seq'])
+            if distance == 0:
+                stream['expected_seq'] = seq_add(stream['expected_seq'], 1)
+                return [segment]
+            if distance < 0:
+                return []
+            if distance >= self.stream_buffer_capacity:
+                return None
+            window = ReceiveWindow(self.stream_buffer_capacity, stream['expected_seq'])
+
+        if not window.offer(segment, segment.stream_seq):
+            return None
+        ready = window.pop_ready()
+        stream['expected_seq'] = window.expected
+        stream['receive_window'] = window if len(window) else None
+        return ready
+
+    def negotiate_mss(self, peer_mss: Optional[int]) -> None:
+        """
+        Agree on the MSS with the peer during the handshake.
+        
+        Neither side may send segments larger than the other can receive. A
+        peer that doesn't announce an MSS only gets the base segment size.
+        """
+        self.mss = min(self.local_mss, peer_mss or BASE_SEGMENT_SIZE)
+        self.segment_size = min(self.segment_size, self.mss)
+        print(f"Negotiated MSS of {self.mss} bytes")
+
+    def fragment_payload(self, payload: Dict, stream_id: int = 0) -> List[Tuple[Dict, bool]]:
+        """
+        Split a payload into pieces that each fit into one segment.
+        
+        A payload that fits is sent as-is. Otherwise its JSON encoding is
+        cut into chunks and each one is carried as {'fragment': chunk}; every
+        piece but the last is marked with more_fragments, so the receiver
+        knows to keep collecting.
+        
+        Returns:
+            List of (payload, more_fragments) tuples, in sending order
+        """
+        stream = self.streams.get(stream_id)
+        send_seq = stream['send_seq'] if stream else 0
+
+        def encoded_size(piece, more):
+            # Leave room for sequence numbers growing a few digits
+            segment = Segment(self.seq_num, self.expected_seq, SegmentType.DATA, piece,
+                              stream_id, send_seq, more)
+            return len(segment.to_bytes()) + 16
+
+        if encoded_size(payload, False) <= self.segment_size:
+            return [(payload, False)]
+
+        data = json.dumps(payload)
+        available = self.segment_size - encoded_size({'fragment': ''}, True)
+        pieces = []
+        chunk, room = [], available
+        for token in JSON_TOKENS.findall(data):
+            while token:
+                # The chunk is escaped again inside the segment, so quotes and
+                # backslashes take up two bytes each
+                if token[0] == '\\':
+                    take = len(token) if escaped_size(token) <= room else 0
+                else:
+                    take = min(len(token), room)
+                    while take and escaped_size(token[:take]) > room:
+                        take -= (escaped_size(token[:take]) - room + 1) // 2
+                if not take:
+                    if not chunk:
+                        raise ValueError(f"Segment size {self.segment_size} is too small to fragment into")
+                    pieces.append({'fragment': ''.join(chunk)})
+                    chunk, room = [], available
+                    continue
+                chunk.append(token[:take])
+                room -= escaped_size(token[:take])
+                token = token[take:]
+        if chunk:
+            pieces.append({'fragment': ''.join(chunk)})
+        return [(piece, i < len(pieces) - 1) for i, piece in enumerate(pieces)]
+
+    def create_data_segment(self, payload: Dict, stream_id: int = 0, more_fragments: bool = False) -> Segment:
+        """
+        Build the next DATA segment for a stream.
+        
+        The segment takes the connection's current sequence number (used for
+        acknowledgment and retransmission) and the stream's next sequence
+        number (used for ordering on the receiving side). If we gave up on
+        data on this stream, the segment tells the receiver to skip past it.
+        """
+        stream = self.get_stream(stream_id)
+        segment = Segment(
+            seq_num=self.seq_num,
+            ack_num=self.expected_seq,
+            flags=SegmentType.DATA,
+            payload=payload,
+            stream_id=stream_id,
+            stream_seq=stream['send_seq'],
+            more_fragments=more_fragments,
+            stream_reset=stream['resync']
+        )
+        stream['send_seq'] = seq_add(stream['send_seq'], 1)
+        stream['resync'] = False
+        return segment
+
+    def abandon_segment(self, seq: int) -> None:
+        """
+        Give up on an unacknowledged segment.
+        
+        The receiver may still be waiting for its stream position (and the
+        rest of its payload), so the next segment on that stream is marked
+        with stream_reset to let the receiver move on.
+        """
+        segment = self.unacked_segments.segment(seq)
+        if self.unacked_segments.remove(seq):
+            self.get_stream(segment.stream_id)['resync'] = True
+
+    def reliable_send(self, payload: Dict, addr: Tuple[str, int], stream_id: int = 0,
+                      on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
         """
         Send data with reliability guarantees (like TCP).
         
@@ -106,9 +331,16 @@ class TransportBase:
         - Acknowledgments
         - Retransmission on timeout
         
+        Payloads too large for one segment are split into several, each sent
+        and acknowledged in turn.
+        
         Args:
             payload: Data to send
             addr: Destination address
+            stream_id: Stream to send the data on
+            on_segment: Called with (segment, addr) for every other segment
+                received while waiting for acknowledgments, e.g. data the
+                peer sends at the same time. Without it they are dropped.
             
         Returns:
             bool: True if data was successfully acknowledged, False otherwise
@@ -117,97 +349,326 @@ class TransportBase:
             print("Not connected")
             return False
 
-        segment = Segment(
-            seq_num=self.seq_num,
-            ack_num=self.expected_seq,
-            flags=SegmentType.DATA,
-            payload=payload
-        )
+        for piece, more_fragments in self.fragment_payload(payload, stream_id):
+            segment = self.create_data_segment(piece, stream_id, more_fragments)
+            if not self.send_and_wait(segment, addr, on_segment):
+                return False
+        return True
 
-        # Try sending with retransmission
+    def send_and_wait(self, segment: Segment, addr: Tuple[str, int],
+                      on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
+        """
+        Send one DATA segment and wait for its acknowledgment (stop-and-wait),
+        retransmitting on timeout.
+        
+        Segments other than the expected ACK that arrive while waiting are
+        passed to on_segment (if given) rather than being thrown away.
+        
+        Returns:
+            bool: True if the segment was acknowledged, False otherwise
+        """
         for attempt in range(self.max_retries):
-            try:
-                self.send_segment(segment, addr)
-                
-                # Wait for acknowledgment
-                ack_segment, _ = self.receive_segment(timeout=self.timeout)
-                if (ack_segment and 
-                    ack_segment.flags == SegmentType.ACK and 
-                    ack_segment.ack_num == self.seq_num + 1):
-                    
+            if attempt > 0:
+                print(f"Timeout waiting for ACK, attempt {attempt}/{self.max_retries}")
+                self.segment_lost(segment)
+            self.send_segment(segment, addr)
+            
+            # Wait for acknowledgment
+            deadline = time.time() + self.timeout
+            while time.time() < deadline:
+                reply, reply_addr = self.receive_ack(timeout=max(deadline - time.time(), 0.001))
+                if not reply:
+                    continue
+                if reply.flags == SegmentType.ACK and reply.ack_num == seq_add(self.seq_num, 1):
                     # Acknowledgment received, remove from unacked segments
-                    self.unacked_segments.pop(self.seq_num, None)
-                    self.seq_num += 1
+                    self.unacked_segments.ack(self.seq_num)
+                    self.seq_num = seq_add(self.seq_num, 1)
                     return True
-                
-            except socket.timeout:
-                print(f"Timeout waiting for ACK, attempt {attempt + 1}/{self.max_retries}")
-                continue
+                if on_segment:
+                    on_segment(reply, reply_addr)
 
+        # Give up on the segment. Move on to a fresh sequence number so a
+        # late ACK for this one can't be mistaken for the next segment's.
+        self.abandon_segment(self.seq_num)
+        self.seq_num = seq_add(self.seq_num, 1)
         return False
 
-    def handle_received_data(self, segment: Segment, addr: Tuple[str, int]) -> Optional[Dict]:
+    def send_window(self, items: List[Tuple[int, Dict]], addr: Tuple[str, int],
+                    on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
         """
-        Handle received data segments with proper ordering.
+        Send several payloads, possibly on different streams, with up to
+        window_size segments in flight at once.
         
-        This implements in-order delivery by:
-        - Processing segments that arrive in order immediately
-        - Buffering out-of-order segments
-        - Sending acknowledgments
+        The window is shared by all streams (connection-level flow control),
+        but each stream is reassembled independently by the receiver, so a
+        lost segment on one stream doesn't delay delivery on the others.
         
         Args:
-            segment: Received segment
-            addr: Sender's address
+            items: List of (stream_id, payload) tuples, sent in order
+            addr: Destination address
+            on_segment: Called with (segment, addr) for every segment other
+                than an ACK received while sending
             
         Returns:
-            Optional[Dict]: Payload if segment was processed, None if buffered
+            bool: True if every segment was acknowledged, False otherwise
         """
-        if segment.seq_num == self.expected_seq:
-            # Segment arrived in order
-            self.expected_seq += 1
-            
-            # Send acknowledgment
-            ack = Segment(
-                seq_num=self.seq_num,
-                ack_num=segment.seq_num + 1,
-                flags=SegmentType.ACK
-            )
-            self.send_segment(ack, addr)
-            
-            # Process any buffered segments that are now in order
-            while self.expected_seq in self.receive_buffer:
-                buffered = self.receive_buffer.pop(self.expected_seq)
-                self.expected_seq += 1
+        if not self.connected:
+            print("Not connected")
+            return False
+
+        pending = deque(items)
+        fragments = deque()
+        while pending or fragments or self.unacked_segments:
+            # Fill the window
+            while ((pending or fragments) and len(self.unacked_segments) < self.window_size
+                   and self.unacked_segments.has_room(self.seq_num)):
+                if not fragments:
+                    stream_id, payload = pending.popleft()
+                    fragments.extend((stream_id, piece, more) for piece, more
+                                     in self.fragment_payload(payload, stream_id))
+                stream_id, piece, more_fragments = fragments.popleft()
+                self.send_segment(self.create_data_segment(piece, stream_id, more_fragments), addr)
+                self.seq_num = seq_add(self.seq_num, 1)
             
-            return segment.payload
+            # Each ACK acknowledges exactly one segment
+            reply, reply_addr = self.receive_ack(timeout=0.1)
+            if reply and reply.flags == SegmentType.ACK:
+                self.unacked_segments.ack(seq_add(reply.ack_num, -1))
+            elif reply and on_segment:
+                on_segment(reply, reply_addr)
             
-        elif segment.seq_num > self.expected_seq:
-            # Future segment received, buffer it
-            self.receive_buffer[segment.seq_num] = segment
+            if self.check_timeouts():
+                print("Too many retransmissions, giving up")
+                for seq in self.unacked_segments.outstanding():
+                    self.abandon_segment(seq)
+                if fragments:
+                    # The rest of this payload will never be sent
+                    self.get_stream(fragments[0][0])['resync'] = True
+                return False
+
+        return True
+
+    def handle_received_data(self, segment: Segment, addr: Tuple[str, int]) -> List[Tuple[int, Dict]]:
+        """
+        Handle received data segments with proper ordering.
+        
+        This implements in-order delivery per stream by:
+        - Acknowledging every segment individually
+        - Delivering segments that arrive in order for their stream
+        - Buffering out-of-order segments until the gap in that stream is filled
+        
+        Args:
+            segment: Received segment
+            addr: Sender's address
             
-            # Send ACK for last correctly received segment
-            ack = Segment(
-                seq_num=self.seq_num,
-                ack_num=self.expected_seq,
-                flags=SegmentType.ACK
-            )
-            self.send_segment(ack, addr)
+        Returns:
+            List[Tuple[int, Dict]]: (stream_id, payload) for every payload that
+            can now be delivered, in order. Empty if the segment was buffered
+            or was a duplicate.
+        """
+        stream = self.get_stream(segment.stream_id)
+        in_order = self.order_stream_segment(stream, segment)
+        if in_order is None:
+            # Too far ahead to buffer - don't acknowledge it, so the sender
+            # retransmits once the gap in front of it has been filled
+            print(f"Receive buffer full, dropping segment {segment.seq_num}")
+            return []
+        
+        # Acknowledge this segment, even if it's a duplicate (our earlier
+        # ACK may have been lost) so the sender stops retransmitting it
+        ack = Segment(
+            seq_num=self.seq_num,
+            ack_num=seq_add(segment.seq_num, 1),
+            flags=SegmentType.ACK
+        )
+        self.send_segment(ack, addr)
+        if self.expected_seq is None or seq_diff(seq_add(segment.seq_num, 1), self.expected_seq) > 0:
+            self.expected_seq = seq_add(segment.seq_num, 1)
+        
+        # Reassemble payloads that were split across several segments
+        delivered = []
+        for in_order_segment in in_order:
+            if in_order_segment.more_fragments or stream['fragments']:
+                stream['fragments'].append(in_order_segment.payload['fragment'])
+                if not in_order_segment.more_fragments:
+                    delivered.append(json.loads(''.join(stream['fragments'])))
+                    stream['fragments'] = []
+            else:
+                delivered.append(in_order_segment.payload)
             
-        return None
+        return [(segment.stream_id, payload) for payload in delivered]
 
-    def check_timeouts(self):
+    def send_probe(self, size: int, addr: Tuple[str, int]) -> bool:
+        """
+        Send a PROBE segment padded to exactly size bytes and wait for the
+        peer to acknowledge it.
+        
+        Probes are sent once, not retried: a lost probe is simply treated as
+        too big, and the next probe_path_mtu gets another chance at it.
+        
+        Returns:
+            bool: True if the probe got through, meaning segments of this size work
+        """
+        probe = Segment(
+            seq_num=self.seq_num,
+            ack_num=self.expected_seq,
+            flags=SegmentType.PROBE,
+            payload={'size': size, 'padding': ''}
+        )
+        probe.payload['padding'] = 'x' * (size - len(probe.to_bytes()))
+        
+        try:
+            self.send_segment(probe, addr)
+        except OSError:
+            # Too big for our own interface, no need to ask the peer
+            return False
+        
+        deadline = time.time() + self.probe_timeout
+        while time.time() < deadline:
+            reply, _ = self.receive_segment(timeout=max(deadline - time.time(), 0.001))
+            if (reply and
+                reply.flags == SegmentType.PROBE_ACK and
+                reply.payload and reply.payload.get('size') == size):
+                return True
+        return False
+
+    def handle_probe(self, segment: Segment, addr: Tuple[str, int]) -> None:
+        """
+        Answer a PROBE from the peer.
+        
+        Paths are usually symmetric, so a probe size that reached us is also
+        used for our own segments to the peer.
+        """
+        size = segment.payload['size']
+        ack = Segment(
+            seq_num=self.seq_num,
+            ack_num=seq_add(segment.seq_num, 1),
+            flags=SegmentType.PROBE_ACK,
+            payload={'size': size}
+        )
+        self.send_segment(ack, addr)
+        self.segment_size = max(self.segment_size, min(size, self.mss))
+
+    def probe_path_mtu(self, addr: Tuple[str, int]) -> int:
+        """
+        Packetization layer path MTU discovery (like RFC 8899).
+        
+        Searches between the current segment size (known to work) and the
+        negotiated MSS for the largest segment that reaches the peer. The
+        full MSS is tried first, since on most paths it simply works. The
+        search gives up after probe_budget seconds and keeps the largest
+        size found so far.
+        
+        Returns:
+            int: The new segment size
+        """
+        if self.segment_size < self.mss:
+            if self.send_probe(self.mss, addr):
+                self.segment_size = self.mss
+            else:
+                # Binary search, low always being a size known to work
+                low, high = self.segment_size, self.mss - 1
+                give_up = time.time() + self.probe_budget
+                while high - low > PROBE_GRANULARITY and time.time() < give_up:
+                    size = (low + high + 1) // 2
+                    if self.send_probe(size, addr):
+                        low = size
+                    else:
+                        high = size - 1
+                self.segment_size = low
+        
+        self.last_probe = time.time()
+        print(f"Path MTU discovery: using {self.segment_size}-byte segments")
+        return self.segment_size
+
+    def segment_lost(self, segment: Segment) -> None:
+        """
+        Called before a segment is retransmitted.
+        
+        If segments above the base size keep getting lost, the path may
+        have shrunk (a "black hole"), so fall back to the base size for new
+        segments. probe_path_mtu will try to grow again later.
+        
+        This only affects segments created from now on. The lost segment
+        itself is retransmitted as is: the peer may already have it (if only
+        the ACK was lost), so it can't be split under new sequence numbers.
+        A message whose oversized segment never gets through fails, and the
+        next one is sent in base-size segments (marked so the receiver
+        skips the failed one, see abandon_segment).
+        """
+        if self.segment_size > BASE_SEGMENT_SIZE and len(segment.to_bytes()) > BASE_SEGMENT_SIZE:
+            print(f"Segment {segment.seq_num} lost, falling back to {BASE_SEGMENT_SIZE}-byte segments")
+            self.segment_size = BASE_SEGMENT_SIZE
+            self.last_probe = time.time()
+
+    def check_timeouts(self) -> List[int]:
         """
         Check for and retransmit any timed-out segments.
         
         This is a key part of reliability - if a segment isn't acknowledged
         within the timeout period, we assume it was lost and retransmit it.
+        Segments already retransmitted max_retries times are given up on
+        and removed from the send window instead.
+        
+        Returns:
+            List[int]: Sequence numbers of the segments given up on
         """
         current_time = time.time()
-        for seq_num, data in list(self.unacked_segments.items()):
-            if current_time - data['timestamp'] > self.timeout:
+        abandoned = []
+        for seq_num in self.unacked_segments.outstanding():
+            if current_time - self.unacked_segments.send_time(seq_num) > self.timeout:
+                if self.unacked_segments.retry_count(seq_num) >= self.max_retries:
+                    print(f"Giving up on segment {seq_num}")
+                    self.abandon_segment(seq_num)
+                    abandoned.append(seq_num)
+                    continue
                 print(f"Retransmitting segment {seq_num}")
-                self.send_segment(data['segment'], data['addr'])
-                data['timestamp'] = current_time
+                segment = self.unacked_segments.segment(seq_num)
+                self.segment_lost(segment)
+                self.send_segment(segment, self.unacked_segments.addr(seq_num))
+        return abandoned
+
+    def send_fin(self, addr: Tuple[str, int],
+                 on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
+        """
+        Close our side of the connection: send a FIN and wait for the peer
+        to acknowledge it, retransmitting on timeout like a DATA segment.
+        
+        Args:
+            addr: Peer's address
+            on_segment: Called for other segments received while waiting,
+                e.g. the peer's own FIN if both sides close at once
+            
+        Returns:
+            bool: True if the peer acknowledged the FIN
+        """
+        fin = Segment(
+            seq_num=self.seq_num,
+            ack_num=self.expected_seq,
+            flags=SegmentType.FIN
+        )
+        for attempt in range(self.max_retries):
+            self.send_segment(fin, addr)
+            deadline = time.time() + self.timeout
+            while time.time() < deadline:
+                reply, reply_addr = self.receive_ack(timeout=max(deadline - time.time(), 0.001))
+                if not reply:
+                    continue
+                if reply.flags == SegmentType.ACK and reply.ack_num == seq_add(fin.seq_num, 1):
+                    return True
+                if on_segment:
+                    on_segment(reply, reply_addr)
+        print("FIN was not acknowledged")
+        return False
+
+    def acknowledge_fin(self, segment: Segment, addr: Tuple[str, int]) -> None:
+        """Acknowledge the peer's FIN, so it stops retransmitting it"""
+        ack = Segment(
+            seq_num=self.seq_num,
+            ack_num=seq_add(segment.seq_num, 1),
+            flags=SegmentType.ACK
+        )
+        self.send_segment(ack, addr)
 
     def close(self):
         """Close the socket and cleanup"""
@@ -223,8 +684,8 @@ class TransportClient(TransportBase):
     - Sending data reliably
     - Managing client-side connection state
     """
-    def __init__(self, host='localhost', port=12345):
-        super().__init__(host, port)
+    def __init__(self, host='localhost', port=12345, mss=None):
+        super().__init__(host, port, mss)
         self.server_addr = (host, port)
 
     def connect(self) -> bool:
@@ -270,13 +731,13 @@ class TransportClient(TransportBase):
                     # Step 3: Send ACK
                     print("Step 3: Sending ACK...")
                     ack_segment = Segment(
-                        seq_num=self.seq_num + 1,
-                        ack_num=server_seq + 1,
+                        seq_num=seq_add(self.seq_num, 1),
+                        ack_num=seq_add(server_seq, 1),
                         flags=SegmentType.ACK
                     )
                     self.send_segment(ack_segment, addr)
                     
-                    self.seq_num += 1
+                    self.seq_num = seq_add(self.seq_num, 1)
                     self.connected = True
                     print("\nThree-way handshake completed successfully!")
                     return True
@@ -288,17 +749,21 @@ class TransportClient(TransportBase):
         print("Failed to establish connection")
         return False
 
-    def send_message(self, payload: Dict) -> bool:
+    def send_message(self, payload: Dict, stream_id: int = 0,
+                     on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
         """
         Send a message reliably to the server.
         
         Args:
             payload: The message to send
+            stream_id: Stream to send the message on
+            on_segment: Called for other segments received while waiting
+                for acknowledgments (see reliable_send)
             
         Returns:
             bool: True if message was acknowledged, False otherwise
         """
-        return self.reliable_send(payload, self.server_addr)
+        return self.reliable_send(payload, self.server_addr, stream_id, on_segment)
 
 class TransportServer(TransportBase):
     """
@@ -315,7 +780,7 @@ class TransportServer(TransportBase):
     - Expected sequence numbers
     - Connection status
     """
-    def __init__(self, host='localhost', port=12345):
+    def __init__(self, host='localhost', port=12345, mss=None):
         """
         Initialize the server with specific host and port.
         
@@ -325,12 +790,31 @@ class TransportServer(TransportBase):
         Args:
             host: Host address to bind to
             port: Port number to bind to
+            mss: Largest segment we can receive (defaults to DEFAULT_MSS)
         """
-        super().__init__(host, port)
+        super().__init__(host, port, mss)
         self.socket.bind((host, port))
         print(f"Server bound to {host}:{port}")
         # Dictionary to store per-client connection state
-        self.clients = {}  # addr -> {seq_num, expected_seq}
+        self.clients = {}  # addr -> {seq_num, expected_seq, streams, unacked_segments, mss, segment_size}
+
+    def load_client(self, addr: Tuple[str, int]) -> None:
+        """Switch the transport's connection state to the given client"""
+        state = self.clients[addr]
+        self.seq_num = state['seq_num']
+        self.expected_seq = state['expected_seq']
+        self.streams = state['streams']
+        self.unacked_segments = state['unacked_segments']
+        self.mss = state['mss']
+        self.segment_size = state['segment_size']
+
+    def save_client(self, addr: Tuple[str, int]) -> None:
+        """Store the transport's connection state back for the given client"""
+        state = self.clients[addr]
+        state['seq_num'] = self.seq_num
+        state['expected_seq'] = self.expected_seq
+        state['mss'] = self.mss
+        state['segment_size'] = self.segment_size
 
     def accept_connection(self, syn_segment: Segment, client_addr: Tuple[str, int]) -> bool:
         """
@@ -341,7 +825,9 @@ class TransportServer(TransportBase):
         2. Send SYN-ACK to client
         3. Receive ACK from client
         
-        The server also initializes sequence number tracking for the new client.
+        The server also initializes sequence number tracking for the new client,
+        and agrees on the MSS: the SYN and SYN-ACK each carry the largest
+        segment their sender can receive.
         
         Args:
             syn_segment: The SYN segment received from client
@@ -353,12 +839,17 @@ class TransportServer(TransportBase):
         print("\nHandling connection request...")
         
         try:
+            # Every connection starts at the base segment size
+            self.segment_size = BASE_SEGMENT_SIZE
+            self.negotiate_mss((syn_segment.payload or {}).get('mss'))
+            
             # Step 2: Send SYN-ACK
             print("Step 2: Sending SYN-ACK...")
             syn_ack = Segment(
                 seq_num=self.seq_num,
-                ack_num=syn_segment.seq_num + 1,  # Acknowledge client's SYN
-                flags=SegmentType.SYN_ACK
+                ack_num=seq_add(syn_segment.seq_num, 1),  # Acknowledge client's SYN
+                flags=SegmentType.SYN_ACK,
+                payload={'mss': self.local_mss}
             )
             self.send_segment(syn_ack, client_addr)
             
@@ -370,8 +861,12 @@ class TransportServer(TransportBase):
                 print("\nThree-way handshake completed successfully!")
                 # Initialize client state with sequence numbers
                 self.clients[client_addr] = {
-                    'seq_num': self.seq_num + 1,  # Next sequence number to use
-                    'expected_seq': segment.seq_num  # Next expected sequence from client
+                    'seq_num': seq_add(self.seq_num, 1),  # Next sequence number to use
+                    'expected_seq': segment.seq_num,  # Next expected sequence from client
+                    'streams': {},  # Per-stream ordering state for this client
+                    'unacked_segments': SendWindow(self.buffer_capacity),  # Our unacknowledged segments
+                    'mss': self.mss,  # Negotiated MSS
+                    'segment_size': self.segment_size  # Current segment size
                 }
                 # Initialize base expected sequence for this connection
                 self.expected_seq = segment.seq_num
@@ -394,6 +889,7 @@ class TransportServer(TransportBase):
         3. Processes different types of segments:
            - SYN: New connection requests
            - DATA: Data from connected clients
+           - PROBE: Path MTU probes from connected clients
         
         For DATA segments, the server:
         1. Verifies the client is known
@@ -421,17 +917,23 @@ class TransportServer(TransportBase):
                 elif segment.flags == SegmentType.DATA:
                     if addr in self.clients:
                         print(f"\nReceived DATA segment from {addr}")
-                        # Use client-specific sequence number tracking
-                        self.expected_seq = self.clients[addr]['expected_seq']
+                        # Use client-specific sequence number and stream tracking
+                        self.load_client(addr)
                         
                         # Process data with reliability guarantees
-                        payload = self.handle_received_data(segment, addr)
-                        if payload:
-                            print(f"Processed in-order data: {payload}")
-                            # Update client's expected sequence number
-                            self.clients[addr]['expected_seq'] = self.expected_seq
+                        for stream_id, payload in self.handle_received_data(segment, addr):
+                            print(f"Processed in-order data on stream {stream_id}: {payload}")
+                        # Update client's sequence number tracking
+                        self.save_client(addr)
                     else:
                         print(f"Received data from unknown client {addr}")
+                
+                elif segment.flags == SegmentType.PROBE:
+                    if addr in self.clients:
+                        # Client is discovering the path MTU
+                        self.load_client(addr)
+                        self.handle_probe(segment, addr)
+                        self.save_client(addr)
                         
             except KeyboardInterrupt:
                 print("\nServer shutting down...")
@@ -439,6 +941,96 @@ class TransportServer(TransportBase):
             except Exception as e:
                 print(f"Error in server loop: {e}")
 
+class ServerConnection(TransportBase):
+    """
+    One client's connection on a TransportServer's socket.
+    
+    Unlike TransportServer.load_client/save_client, every connection keeps
+    its own sequence numbers, streams and windows, so several clients can be
+    served at the same time. Only one thread may read the shared socket: it
+    hands this client's segments over with deliver(), and receive_segment()
+    takes them from a queue.
+    
+    Once connected, ACKs are queued separately for receive_ack(), so one
+    thread can send (and wait for ACKs) while another receives.
+    """
+    def __init__(self, server: TransportServer, addr: Tuple[str, int]):
+        super().__init__(server.host, server.port, server.local_mss, sock=server.socket)
+        self.addr = addr
+        self.incoming = queue.Queue()
+        self.acks = queue.Queue()
+        # Segments that arrived before the handshake's ACK, processed first
+        self.early = deque()
+
+    def deliver(self, segment: Optional[Segment]) -> None:
+        """
+        Hand over a segment received from this client. None wakes up a
+        receive_segment() call without a segment, e.g. when the server closes.
+        """
+        if segment and self.connected and segment.flags == SegmentType.ACK:
+            self.acks.put(segment)
+        else:
+            self.incoming.put(segment)
+
+    def receive_segment(self, timeout: float = None) -> Tuple[Optional[Segment], Optional[Tuple[str, int]]]:
+        """Take the next segment from this client, or (None, None) on timeout"""
+        if self.early:
+            return self.early.popleft(), self.addr
+        try:
+            segment = self.incoming.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+        return (segment, self.addr) if segment else (None, None)
+
+    def receive_ack(self, timeout: float = None) -> Tuple[Optional[Segment], Optional[Tuple[str, int]]]:
+        """Take the next ACK from this client, or (None, None) on timeout"""
+        try:
+            return self.acks.get(timeout=timeout), self.addr
+        except queue.Empty:
+            return None, None
+
+    def accept(self, syn_segment: Segment) -> bool:
+        """
+        Server side of the three-way handshake (see accept_connection).
+        
+        The SYN-ACK is retransmitted if the client's ACK doesn't arrive or
+        the client repeats its SYN. If the ACK was lost but the client has
+        already moved on to probing or sending data, that completes the
+        handshake too.
+        
+        Returns:
+            bool: True if connection established successfully, False otherwise
+        """
+        self.negotiate_mss((syn_segment.payload or {}).get('mss'))
+        syn_ack = Segment(
+            seq_num=self.seq_num,
+            ack_num=seq_add(syn_segment.seq_num, 1),  # Acknowledge client's SYN
+            flags=SegmentType.SYN_ACK,
+            payload={'mss': self.local_mss}
+        )
+        for attempt in range(self.max_retries):
+            self.send_segment(syn_ack, self.addr)
+            deadline = time.time() + self.timeout
+            while time.time() < deadline:
+                segment, _ = self.receive_segment(timeout=max(deadline - time.time(), 0.001))
+                if not segment:
+                    continue
+                if segment.flags == SegmentType.SYN:
+                    break
+                if segment.flags != SegmentType.ACK:
+                    self.early.append(segment)
+                self.seq_num = seq_add(self.seq_num, 1)
+                self.expected_seq = segment.seq_num
+                self.connected = True
+                print(f"\nThree-way handshake with {self.addr} completed successfully!")
+                return True
+        print(f"Handshake with {self.addr} failed - didn't receive ACK")
+        return False
+
+    def close(self):
+        """The socket belongs to the server, just forget the connection"""
+        self.connected = False
+
 class TransportClient(TransportBase):
     """
     Client-side transport implementation.
@@ -452,15 +1044,16 @@ class TransportClient(TransportBase):
     - Its own outgoing data
     - Expected incoming acknowledgments
     """
-    def __init__(self, host='localhost', port=12345):
+    def __init__(self, host='localhost', port=12345, mss=None):
         """
         Initialize the client with server address information.
         
         Args:
             host: Server's host address
             port: Server's port number
+            mss: Largest segment we can receive (defaults to DEFAULT_MSS)
         """
-        super().__init__(host, port)
+        super().__init__(host, port, mss)
         self.server_addr = (host, port)
 
     def connect(self) -> bool:
@@ -477,6 +1070,7 @@ class TransportClient(TransportBase):
         - Establishes sequence numbers for both sides
         - Ensures both parties are ready to communicate
         - Sets up initial connection state
+        - Negotiates the MSS, then probes the path MTU
         
         Returns:
             bool: True if connection established, False otherwise
@@ -486,16 +1080,18 @@ class TransportClient(TransportBase):
 
         print("\nInitiating three-way handshake...")
         
-        # Step 1: Send SYN
+        # Step 1: Send SYN, announcing the largest segment we can receive
         syn_segment = Segment(
             seq_num=self.seq_num,
             ack_num=0,  # Initial ACK is 0
-            flags=SegmentType.SYN
+            flags=SegmentType.SYN,
+            payload={'mss': self.local_mss}
         )
         
         for attempt in range(self.max_retries):
             try:
                 print("\nStep 1: Sending SYN...")
+                syn_sent = time.time()
                 self.send_segment(syn_segment, (self.host, self.port))
                 
                 # Step 2: Wait for SYN-ACK
@@ -504,21 +1100,28 @@ class TransportClient(TransportBase):
                 
                 if segment and segment.flags == SegmentType.SYN_ACK:
                     # Initialize sequence number tracking
-                    self.expected_seq = segment.seq_num + 1  # Next expected from server
+                    self.expected_seq = seq_add(segment.seq_num, 1)  # Next expected from server
+                    self.negotiate_mss((segment.payload or {}).get('mss'))
+                    # A PROBE_ACK should come back within a few round trips
+                    rtt = time.time() - syn_sent
+                    self.probe_timeout = min(self.probe_timeout, max(MIN_PROBE_TIMEOUT, 4 * rtt))
                     
                     # Step 3: Send ACK
                     print("Step 3: Sending ACK...")
                     ack_segment = Segment(
-                        seq_num=self.seq_num + 1,  # Increment our sequence number
-                        ack_num=segment.seq_num + 1,  # Acknowledge server's sequence number
+                        seq_num=seq_add(self.seq_num, 1),  # Increment our sequence number
+                        ack_num=seq_add(segment.seq_num, 1),  # Acknowledge server's sequence number
                         flags=SegmentType.ACK
                     )
                     self.send_segment(ack_segment, addr)
                     
                     # Update connection state
-                    self.seq_num += 1
+                    self.seq_num = seq_add(self.seq_num, 1)
                     self.connected = True
                     print("\nThree-way handshake completed successfully!")
+                    
+                    # Find out how large our segments can be on this path
+                    self.probe_path_mtu(self.server_addr)
                     return True
                     
             except socket.timeout:
@@ -528,22 +1131,30 @@ class TransportClient(TransportBase):
         print("Failed to establish connection")
         return False
 
-    def send_message(self, payload: Dict) -> bool:
+    def send_message(self, payload: Dict, stream_id: int = 0,
+                     on_segment: Optional[Callable[[Segment, Tuple[str, int]], None]] = None) -> bool:
         """
         Send a message reliably to the server.
         
         This method:
         1. Ensures connection is established
-        2. Creates a DATA segment with the payload
-        3. Sends it using reliable transmission
+        2. Periodically re-probes the path MTU, in case it has grown
+        3. Creates DATA segments with the payload
+        4. Sends them using reliable transmission
         
         Args:
             payload: The message data to send
+            stream_id: Stream to send the message on. All streams share
+                this connection, so no new handshake is needed.
+            on_segment: Called for other segments received while waiting
+                for acknowledgments (see reliable_send)
             
         Returns:
             bool: True if message was acknowledged, False otherwise
         """
-        return self.reliable_send(payload, self.server_addr)
+        if self.connected and time.time() - self.last_probe > self.probe_interval:
+            self.probe_path_mtu(self.server_addr)
+        return self.reliable_send(payload, self.server_addr, stream_id, on_segment)
 # Example usage
 if __name__ == "__main__":
     import sys
@@ -569,5 +1180,17 @@ if __name__ == "__main__":
                     print("Test message sent and acknowledged successfully")
                 else:
                     print("Failed to send test message")
+                
+                # Send on two independent streams over the same connection
+                stream_payloads = [
+                    (1, {"type": "DATA", "payload": "Stream 1, message 1"}),
+                    (2, {"type": "DATA", "payload": "Stream 2, message 1"}),
+                    (1, {"type": "DATA", "payload": "Stream 1, message 2"}),
+                    (2, {"type": "DATA", "payload": "Stream 2, message 2"}),
+                ]
+                if client.send_window(stream_payloads, client.server_addr):
+                    print("Stream messages sent and acknowledged successfully")
+                else:
+                    print("Failed to send stream messages")
         finally:
             client.close()
\ No newline at end of file
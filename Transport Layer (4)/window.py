@@ -0,0 +1,218 @@
+from array import array
+from typing import List, Optional, Tuple
+from segment import Segment
+
+# Sequence numbers are 32 bits (like TCP) and wrap around to 0
+SEQ_SPACE = 1 << 32
+
+def seq_add(seq: int, n: int) -> int:
+    """Advance a sequence number by n, wrapping around at 2^32"""
+    return (seq + n) % SEQ_SPACE
+
+def seq_diff(a: int, b: int) -> int:
+    """
+    Signed distance from sequence number b to a (serial number arithmetic,
+    RFC 1982). Positive if a comes after b, even across a wraparound.
+    """
+    diff = (a - b) % SEQ_SPACE
+    return diff - SEQ_SPACE if diff >= SEQ_SPACE // 2 else diff
+
+class SequenceRing:
+    """
+    Fixed-capacity ring buffer of segments indexed by sequence number.
+
+    The slot for a sequence number is seq % capacity. The capacity must be a
+    power of two so it divides 2^32 evenly, which keeps consecutive sequence
+    numbers in consecutive slots even when they wrap around to 0.
+
+    Per-slot state is kept in parallel arrays rather than a dict of dicts,
+    so tracking a segment allocates nothing beyond the segment itself. A
+    bitmap marks which slots are set (acknowledged or received).
+    """
+    def __init__(self, capacity: int):
+        if capacity < 8 or capacity & (capacity - 1):
+            raise ValueError("Capacity must be a power of two and at least 8")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.segments: List[Optional[Segment]] = [None] * capacity
+        self.bitmap = bytearray(capacity // 8)
+
+    def test_bit(self, seq: int) -> bool:
+        slot = seq & self.mask
+        return bool(self.bitmap[slot >> 3] & (1 << (slot & 7)))
+
+    def set_bit(self, seq: int) -> None:
+        slot = seq & self.mask
+        self.bitmap[slot >> 3] |= 1 << (slot & 7)
+
+    def clear_bit(self, seq: int) -> None:
+        slot = seq & self.mask
+        self.bitmap[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+
+class SendWindow(SequenceRing):
+    """
+    Segments sent but not yet acknowledged.
+
+    The window covers sequence numbers from base (oldest unacknowledged)
+    up to next (one past the newest sent). Segments may be acknowledged out
+    of order - the bitmap marks them (like TCP SACK) and base moves forward
+    once the oldest one is acknowledged.
+    """
+    def __init__(self, capacity: int = 1024):
+        super().__init__(capacity)
+        self.send_times = array('d', bytes(8 * capacity))
+        self.retries = array('H', bytes(2 * capacity))
+        self.addrs: List[Optional[Tuple[str, int]]] = [None] * capacity
+        self.base = 0
+        self.next = 0
+        self.count = 0  # Number of unacknowledged segments
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, seq: int) -> bool:
+        """True if seq has been sent and is still unacknowledged"""
+        return 0 <= seq_diff(seq, self.base) < seq_diff(self.next, self.base) and not self.test_bit(seq)
+
+    def has_room(self, seq: int) -> bool:
+        """True if seq can be added without overwriting an outstanding slot"""
+        return self.count == 0 or seq_diff(seq, self.base) < self.capacity
+
+    def add(self, segment: Segment, addr: Tuple[str, int], now: float) -> None:
+        """
+        Record that a segment was sent. Sending a segment that is still
+        unacknowledged counts as a retransmission.
+
+        Raises:
+            ValueError: If the window is full, or seq comes before base while
+            segments are outstanding (it could never be acknowledged)
+        """
+        seq = segment.seq_num
+        slot = seq & self.mask
+        if seq in self:
+            # Saturate rather than overflow the 16-bit counter
+            self.retries[slot] = min(self.retries[slot] + 1, 0xFFFF)
+        else:
+            if self.count and seq_diff(seq, self.base) < 0:
+                raise ValueError(f"Segment {seq} is behind the send window base {self.base}")
+            if not self.has_room(seq):
+                raise ValueError(f"Send window full, can't add segment {seq}")
+            if self.count == 0:
+                self.base = seq
+                self.next = seq
+            self.retries[slot] = 0
+            self.clear_bit(seq)
+            self.count += 1
+            if seq_diff(seq, self.next) >= 0:
+                self.next = seq_add(seq, 1)
+        self.segments[slot] = segment
+        self.addrs[slot] = addr
+        self.send_times[slot] = now
+
+    def ack(self, seq: int) -> bool:
+        """
+        Mark a segment as acknowledged and slide the window past any
+        acknowledged segments at its start.
+
+        Returns:
+            bool: True if the segment was outstanding
+        """
+        if seq not in self:
+            return False
+        slot = seq & self.mask
+        self.set_bit(seq)
+        self.segments[slot] = None
+        self.addrs[slot] = None
+        self.count -= 1
+
+        while self.base != self.next and self.test_bit(self.base):
+            self.clear_bit(self.base)
+            self.base = seq_add(self.base, 1)
+        return True
+
+    def remove(self, seq: int) -> bool:
+        """
+        Stop tracking a segment the sender has given up on. The window
+        slides past it as if it had been acknowledged.
+
+        Returns:
+            bool: True if the segment was outstanding
+        """
+        return self.ack(seq)
+
+    def outstanding(self) -> List[int]:
+        """Sequence numbers of all unacknowledged segments, oldest first"""
+        span = seq_diff(self.next, self.base) if self.count else 0
+        return [seq_add(self.base, i) for i in range(span) if not self.test_bit(seq_add(self.base, i))]
+
+    def segment(self, seq: int) -> Segment:
+        return self.segments[seq & self.mask]
+
+    def addr(self, seq: int) -> Tuple[str, int]:
+        return self.addrs[seq & self.mask]
+
+    def send_time(self, seq: int) -> float:
+        return self.send_times[seq & self.mask]
+
+    def retry_count(self, seq: int) -> int:
+        return self.retries[seq & self.mask]
+
+class ReceiveWindow(SequenceRing):
+    """
+    Reassembly buffer for one stream.
+
+    Holds segments that arrived ahead of expected (the next sequence number
+    to deliver). The bitmap marks which slots have been received.
+    """
+    def __init__(self, capacity: int = 1024, expected: int = 0):
+        super().__init__(capacity)
+        self.expected = expected
+        self.count = 0  # Number of buffered segments
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offer(self, segment: Segment, seq: int) -> bool:
+        """
+        Buffer a received segment stored under sequence number seq.
+
+        Returns:
+            bool: False if it is too far ahead to fit in the buffer (it
+            should not be acknowledged, so the sender retransmits it later).
+            True otherwise, including for duplicates of delivered segments.
+        """
+        distance = seq_diff(seq, self.expected)
+        if distance < 0:
+            return True
+        if distance >= self.capacity:
+            return False
+        if not self.test_bit(seq):
+            self.count += 1
+        self.segments[seq & self.mask] = segment
+        self.set_bit(seq)
+        return True
+
+    def skip_to(self, seq: int) -> None:
+        """
+        Give up on every sequence number before seq, dropping any segments
+        buffered there, and expect seq next
+        """
+        for _ in range(min(max(seq_diff(seq, self.expected), 0), self.capacity)):
+            if self.test_bit(self.expected):
+                self.segments[self.expected & self.mask] = None
+                self.clear_bit(self.expected)
+                self.count -= 1
+            self.expected = seq_add(self.expected, 1)
+        self.expected = seq
+
+    def pop_ready(self) -> List[Segment]:
+        """Remove and return the segments that can now be delivered in order"""
+        ready = []
+        while self.test_bit(self.expected):
+            slot = self.expected & self.mask
+            ready.append(self.segments[slot])
+            self.segments[slot] = None
+            self.clear_bit(self.expected)
+            self.expected = seq_add(self.expected, 1)
+        self.count -= len(ready)
+        return ready